@@ -0,0 +1,77 @@
+import importlib
+import pytest
+from src.lib.results_store import ResultsStore
+from src.lib.test_base import TestBase
+
+
+def pytest_addoption(parser):
+    parser.addoption("--results-db", default=None,
+                     help="SQLite file to persist test results in")
+    parser.addoption("--ecu", default=None,
+                     help="Name of the ECU under test, recorded with the results")
+    parser.addoption("--firmware-version", default=None,
+                     help="Firmware version under test, recorded with the results")
+    parser.addoption("--key-function", default=None,
+                     help="Security access key function of the ECU under test, as module:function")
+    parser.addoption("--no-ecu-state-order", action="store_true", default=False,
+                     help="Run tests in collection order instead of grouping them by required ECU state")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "ecu_state(session=None, security_level=None, dtcs_cleared=False): "
+                                       "ECU state the test requires, established by TestBase before the test")
+    config.addinivalue_line("markers", "ecu_state_destructive: test leaves the ECU in a state other tests "
+                                       "cannot start from (e.g. security lockout); it runs last")
+    config.addinivalue_line("markers", "skip_production: test must not run against production ECUs")
+    TestBase.ecu = config.getoption("--ecu")
+    TestBase.firmware_version = config.getoption("--firmware-version")
+    if config.getoption("--key-function"):
+        module, _, function = config.getoption("--key-function").partition(":")
+        if not function:
+            raise pytest.UsageError("--key-function must be given as module:function")
+        TestBase.key_function = getattr(importlib.import_module(module), function)
+    if config.getoption("--results-db"):
+        TestBase.results_store = ResultsStore(config.getoption("--results-db"))
+
+
+def pytest_unconfigure(config):
+    if TestBase.results_store is not None:
+        TestBase.results_store.close()
+        TestBase.results_store = None
+
+
+def pytest_collection_modifyitems(config, items):
+    """Group tests by required ECU state so that shared transitions are done once"""
+    if config.getoption("--no-ecu-state-order"):
+        return
+    items.sort(key=TestBase.ecu_state_order)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_setup(item):
+    """Establish the required ECU state once TestBase.setup_method has run"""
+    outcome = yield
+    if outcome.excinfo is None and isinstance(item.instance, TestBase):
+        item.instance.establish_ecu_state(TestBase.required_ecu_state(item))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item):
+    """Forget the tracked ECU state after a test that disturbs it"""
+    diag_interface = getattr(item.instance, "diag_interface", None)
+    if diag_interface is not None and item.get_closest_marker("ecu_state_destructive"):
+        diag_interface.ecu_state.forget()
+    yield
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Expose the node ID and test outcome to TestBase before its teardown runs"""
+    outcome = yield
+    report = outcome.get_result()
+    if isinstance(item.instance, TestBase):
+        item.instance.test_node_id = item.nodeid
+        if report.when == "call":
+            item.instance.test_result = report.outcome
+        elif report.when == "setup" and report.failed:
+            item.instance.test_result = "error"
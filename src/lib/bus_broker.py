@@ -0,0 +1,463 @@
+import argparse
+import itertools
+import os
+import secrets
+import socket
+import struct
+import threading
+import time
+from multiprocessing import AuthenticationError, resource_tracker
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Optional, Tuple
+
+import can
+from loguru import logger
+
+# Ring header: magic, version, slot size, capacity, TX listener port, head sequence,
+# submission authkey. The block is created with mode 0600, so only the user
+# running the broker can read the key.
+_HEADER = struct.Struct('<IHHIIQ32s')
+_HEADER_SIZE = 64
+_HEAD_OFFSET = 16
+_AUTHKEY_SIZE = 32
+_MAGIC = 0x41544652  # "ATFR"
+_VERSION = 2
+
+# Slot: sequence, timestamp, arbitration ID, origin client, flags, DLC, then data
+_SLOT = struct.Struct('<QdIIBB6x')
+_SEQ = struct.Struct('<Q')
+_DATA_SIZE = 64  # Large enough for CAN FD frames
+_SLOT_SIZE = _SLOT.size + _DATA_SIZE
+
+# Submissions use the slot layout with the submission number in place of the
+# sequence; replies carry the submission number, a success flag and an error text
+_REPLY = struct.Struct('<Q?')
+
+_FLAG_EXTENDED = 0x01
+_FLAG_REMOTE = 0x02
+_FLAG_ERROR = 0x04
+_FLAG_FD = 0x08
+_FLAG_BRS = 0x10
+_FLAG_ESI = 0x20
+
+BROKER_ORIGIN = 0  # Origin of frames received from the physical bus
+
+
+def ring_name(channel: str) -> str:
+    """
+    Get the shared memory name used by the broker of a channel
+
+    Args:
+        channel: CAN interface name owned by the broker
+
+    Returns:
+        Shared memory block name
+    """
+    return f"atf_can_{channel}"
+
+
+def _message_flags(msg: can.Message) -> int:
+    """Pack the boolean attributes of a message into a flags byte"""
+    flags = 0
+    if msg.is_extended_id:
+        flags |= _FLAG_EXTENDED
+    if msg.is_remote_frame:
+        flags |= _FLAG_REMOTE
+    if msg.is_error_frame:
+        flags |= _FLAG_ERROR
+    if msg.is_fd:
+        flags |= _FLAG_FD
+    if msg.bitrate_switch:
+        flags |= _FLAG_BRS
+    if msg.error_state_indicator:
+        flags |= _FLAG_ESI
+    return flags
+
+
+def _build_message(arbitration_id: int, flags: int, data, timestamp: float = 0.0,
+                   channel: Optional[str] = None) -> can.Message:
+    """Create a CAN message from its packed representation"""
+    return can.Message(timestamp=timestamp,
+                       arbitration_id=arbitration_id,
+                       data=data,
+                       is_extended_id=bool(flags & _FLAG_EXTENDED),
+                       is_remote_frame=bool(flags & _FLAG_REMOTE),
+                       is_error_frame=bool(flags & _FLAG_ERROR),
+                       is_fd=bool(flags & _FLAG_FD),
+                       bitrate_switch=bool(flags & _FLAG_BRS),
+                       error_state_indicator=bool(flags & _FLAG_ESI),
+                       channel=channel)
+
+
+def _pack_frame(number: int, msg: can.Message, origin: int = BROKER_ORIGIN) -> bytes:
+    """Pack a frame for submission in the slot layout"""
+    if len(msg.data) > _DATA_SIZE:
+        raise ValueError(f"Frame data longer than {_DATA_SIZE} bytes")
+    return _SLOT.pack(number, msg.timestamp, msg.arbitration_id, origin,
+                      _message_flags(msg), len(msg.data)) + bytes(msg.data)
+
+
+def _unpack_frame(buf: bytes) -> Tuple[int, int, int, bytes]:
+    """Unpack a submitted frame into (number, arbitration ID, flags, data)"""
+    number, _, arbitration_id, _, flags, dlc = _SLOT.unpack_from(buf, 0)
+    data = buf[_SLOT.size:]
+    if len(data) != dlc:
+        raise ValueError(f"Submitted frame has {len(data)} data bytes, expected {dlc}")
+    return number, arbitration_id, flags, data
+
+
+def _attach_shared_memory(name: str) -> SharedMemory:
+    """
+    Attach to an existing shared memory block without taking ownership
+
+    Before Python 3.13 the resource tracker unlinks every attached block when
+    the attaching process exits, which would tear the ring down under the broker,
+    so registration is suppressed while attaching.
+    """
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedFrameRing:
+    """Single-producer, multi-consumer CAN frame ring in shared memory
+
+    The broker is the only writer. Each slot carries the sequence number of the
+    frame it holds; the writer clears it before touching the slot and publishes
+    it last, so readers detect torn or overwritten slots without any lock.
+    """
+
+    def __init__(self, name: str, capacity: int = 4096, create: bool = False,
+                 tx_port: int = 0, authkey: bytes = b''):
+        """
+        Create or attach to a frame ring
+
+        Args:
+            name: Shared memory block name
+            capacity: Number of frame slots (only used when creating)
+            create: Whether to create the ring (broker) or attach to it (client)
+            tx_port: Port of the broker's submission listener (only used when creating)
+            authkey: Key clients must present to the listener (only used when creating)
+        """
+        self.owner = create
+        if create:
+            size = _HEADER_SIZE + capacity * _SLOT_SIZE
+            self.shm = SharedMemory(name=name, create=True, size=size)
+            self.shm.buf[:size] = bytes(size)
+            _HEADER.pack_into(self.shm.buf, 0, _MAGIC, _VERSION, _SLOT_SIZE,
+                              capacity, tx_port, 0, authkey)
+        else:
+            self.shm = _attach_shared_memory(name)
+            magic, version, slot_size, capacity, tx_port, _, authkey = \
+                _HEADER.unpack_from(self.shm.buf, 0)
+            if magic != _MAGIC or version != _VERSION or slot_size != _SLOT_SIZE:
+                self.shm.close()
+                raise ValueError(f"Shared memory block {name} is not a compatible frame ring")
+        self.name = name
+        self.capacity = capacity
+        self.tx_port = tx_port
+        self.authkey = authkey
+        self.buf = self.shm.buf
+
+    @property
+    def head(self) -> int:
+        """Sequence number of the most recently published frame"""
+        return _SEQ.unpack_from(self.buf, _HEAD_OFFSET)[0]
+
+    def _slot_offset(self, seq: int) -> int:
+        return _HEADER_SIZE + ((seq - 1) % self.capacity) * _SLOT_SIZE
+
+    def write(self, msg: can.Message, origin: int = BROKER_ORIGIN):
+        """
+        Publish a frame to the ring (broker only)
+
+        Args:
+            msg: CAN message to publish
+            origin: Client ID that sent the frame, or BROKER_ORIGIN if received from the bus
+        """
+        seq = self.head + 1
+        offset = self._slot_offset(seq)
+        dlc = min(len(msg.data), _DATA_SIZE)
+
+        _SEQ.pack_into(self.buf, offset, 0)
+        self.buf[offset + _SLOT.size:offset + _SLOT.size + dlc] = msg.data[:dlc]
+        _SLOT.pack_into(self.buf, offset, 0, msg.timestamp or time.time(),
+                        msg.arbitration_id, origin, _message_flags(msg), dlc)
+        _SEQ.pack_into(self.buf, offset, seq)
+        _SEQ.pack_into(self.buf, _HEAD_OFFSET, seq)
+
+    def read(self, seq: int) -> Tuple[str, Optional[Tuple[float, int, int, int, bytes]]]:
+        """
+        Read the frame with a given sequence number
+
+        Args:
+            seq: Sequence number to read
+
+        Returns:
+            Tuple containing:
+            - str: 'ok', 'pending' if not yet published or 'overrun' if already overwritten
+            - Tuple of (timestamp, arbitration ID, origin, flags, data) or None
+        """
+        offset = self._slot_offset(seq)
+        slot_seq, timestamp, arbitration_id, origin, flags, dlc = _SLOT.unpack_from(self.buf, offset)
+        if slot_seq != seq:
+            return ('overrun' if slot_seq > seq or self.head >= seq + self.capacity
+                    else 'pending'), None
+
+        data = bytes(self.buf[offset + _SLOT.size:offset + _SLOT.size + dlc])
+        if _SEQ.unpack_from(self.buf, offset)[0] != seq:
+            return 'overrun', None
+        return 'ok', (timestamp, arbitration_id, origin, flags, data)
+
+    def close(self):
+        """Detach from the ring, removing it if this process created it"""
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class BusBroker:
+    """Owns a CAN channel and shares it with other processes
+
+    Received frames are published to a SharedFrameRing. Frames to transmit are
+    submitted by clients over a local connection and echoed to the ring so that
+    every other client (loggers, dashboards, parallel tests) sees them as well.
+    """
+
+    def __init__(self, channel: str, bitrate: int = 500000, bus_type: str = 'socketcan',
+                 capacity: int = 4096, tx_port: int = 0):
+        """
+        Initialize the bus broker
+
+        Args:
+            channel: CAN interface name
+            bitrate: Bitrate of CAN bus
+            bus_type: Type of the underlying CAN bus (socketcan, kvaser, pcan, etc.)
+            capacity: Number of frames kept in the shared ring
+            tx_port: Local port for frame submissions (0 picks a free port)
+        """
+        self.channel = channel
+        self.bus = can.interface.Bus(channel=channel,
+                                     bustype=bus_type,
+                                     bitrate=bitrate)
+        # Clients authenticate with a key only readable from the shared ring
+        self._authkey = secrets.token_bytes(_AUTHKEY_SIZE)
+        try:
+            self.listener = Listener(('127.0.0.1', tx_port))
+            self.ring = SharedFrameRing(ring_name(channel), capacity, create=True,
+                                        tx_port=self.listener.address[1], authkey=self._authkey)
+        except Exception:
+            self.bus.shutdown()
+            raise
+
+        self._write_lock = threading.Lock()
+        # python-can buses are not safe for concurrent sends from client threads
+        self._send_lock = threading.Lock()
+        self._client_ids = itertools.count(1)
+        self._connections: Dict[int, object] = {}
+        self._running = False
+        self._threads = []
+        logger.info(f"Bus broker for {channel} serving ring {self.ring.name} "
+                    f"and submissions on port {self.ring.tx_port}")
+
+    def start(self):
+        """Start forwarding frames between the bus and clients"""
+        self._running = True
+        for target in (self._receive_loop, self._accept_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def serve_forever(self):
+        """Run the broker until interrupted"""
+        self.start()
+        try:
+            while self._running:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _publish(self, msg: can.Message, origin: int):
+        with self._write_lock:
+            if self._running:
+                self.ring.write(msg, origin)
+
+    def _receive_loop(self):
+        while self._running:
+            try:
+                msg = self.bus.recv(timeout=0.1)
+            except Exception as e:
+                logger.error(f"Broker error receiving CAN message: {str(e)}")
+                continue
+            if msg is not None:
+                self._publish(msg, BROKER_ORIGIN)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn = self.listener.accept()
+            except Exception as e:
+                if self._running:
+                    logger.error(f"Broker failed to accept client: {str(e)}")
+                continue
+            client_id = next(self._client_ids)
+            self._connections[client_id] = conn
+            thread = threading.Thread(target=self._client_loop, args=(client_id, conn), daemon=True)
+            thread.start()
+
+    def _client_loop(self, client_id: int, conn):
+        try:
+            # Authenticate here rather than in accept(), so that a client which
+            # never answers the challenge cannot block other clients
+            deliver_challenge(conn, self._authkey)
+            answer_challenge(conn, self._authkey)
+            conn.send_bytes(_SEQ.pack(client_id))
+            logger.debug(f"Bus broker client {client_id} connected")
+            while self._running:
+                submission = conn.recv_bytes(_SLOT_SIZE)
+                number = _SEQ.unpack_from(submission, 0)[0] if len(submission) >= _SEQ.size else 0
+                try:
+                    _, arbitration_id, flags, data = _unpack_frame(submission)
+                    msg = _build_message(arbitration_id, flags, data, channel=self.channel)
+                    with self._send_lock:
+                        self.bus.send(msg)
+                except Exception as e:
+                    conn.send_bytes(_REPLY.pack(number, False) + str(e).encode())
+                    continue
+                msg.timestamp = time.time()
+                self._publish(msg, client_id)
+                conn.send_bytes(_REPLY.pack(number, True))
+        except AuthenticationError:
+            logger.warning(f"Bus broker rejected client {client_id}: authentication failed")
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._connections.pop(client_id, None)
+            conn.close()
+            logger.debug(f"Bus broker client {client_id} disconnected")
+
+    def stop(self):
+        """Stop the broker and release the bus and shared ring"""
+        if not self._running and not self._threads:
+            return
+        self._running = False
+        self.listener.close()
+        for conn in list(self._connections.values()):
+            # Closing the connection under a blocked client thread would crash it,
+            # so shut the socket down and let the thread see end of file
+            try:
+                with socket.socket(fileno=os.dup(conn.fileno())) as sock:
+                    sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+        self.bus.shutdown()
+        with self._write_lock:
+            self.ring.close()
+        logger.info(f"Bus broker for {self.channel} stopped")
+
+
+class BrokerBus(can.BusABC):
+    """python-can bus reading from and submitting to a BusBroker
+
+    Used by CANInterface when bus_type is 'broker'. Frames sent by this bus
+    are not delivered back to it, matching a physical CAN node.
+    """
+
+    def __init__(self, channel: str, poll_interval: float = 0.0005, **kwargs):
+        """
+        Attach to the broker owning a channel
+
+        Args:
+            channel: CAN interface name owned by the broker
+            poll_interval: Sleep between ring polls while waiting for frames
+        """
+        self.ring = SharedFrameRing(ring_name(channel))
+        try:
+            self.conn = Client(('127.0.0.1', self.ring.tx_port), authkey=self.ring.authkey)
+            self.client_id = _SEQ.unpack(self.conn.recv_bytes(_SEQ.size))[0]
+        except Exception:
+            self.ring.close()
+            raise
+        self.poll_interval = poll_interval
+        self.cursor = self.ring.head + 1
+        self.dropped_frames = 0
+        self._send_lock = threading.Lock()
+        self._submissions = itertools.count(1)
+        self.channel_info = f"broker:{channel}"
+        super().__init__(channel=channel, **kwargs)
+
+    def _recv_internal(self, timeout: Optional[float]) -> Tuple[Optional[can.Message], bool]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status, frame = self.ring.read(self.cursor)
+            if status == 'ok':
+                self.cursor += 1
+                timestamp, arbitration_id, origin, flags, data = frame
+                if origin == self.client_id:
+                    continue
+                return _build_message(arbitration_id, flags, data, timestamp, self.channel_info), False
+            if status == 'overrun':
+                resync = max(self.ring.head - self.ring.capacity + 1, self.cursor + 1)
+                self.dropped_frames += resync - self.cursor
+                logger.warning(f"Broker ring overrun, dropped {resync - self.cursor} frames")
+                self.cursor = resync
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                return None, False
+            time.sleep(self.poll_interval)
+
+    def send(self, msg: can.Message, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._send_lock:
+            number = next(self._submissions)
+            try:
+                self.conn.send_bytes(_pack_frame(number, msg))
+                # Replies are numbered, so acks of earlier submissions that timed out are skipped
+                while True:
+                    if deadline is not None and \
+                            not self.conn.poll(max(0.0, deadline - time.monotonic())):
+                        raise can.CanOperationError("Timed out waiting for bus broker")
+                    reply = self.conn.recv_bytes()
+                    reply_number, success = _REPLY.unpack_from(reply, 0)
+                    if reply_number == number:
+                        break
+            except (EOFError, OSError) as e:
+                raise can.CanOperationError(f"Lost connection to bus broker: {str(e) or type(e).__name__}") from e
+        if not success:
+            error = reply[_REPLY.size:].decode(errors='replace')
+            raise can.CanOperationError(f"Bus broker failed to send: {error}")
+
+    def shutdown(self):
+        super().shutdown()
+        self.conn.close()
+        self.ring.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share a CAN channel with other processes")
+    parser.add_argument('--channel', default='can0', help="CAN interface name")
+    parser.add_argument('--bitrate', type=int, default=500000, help="Bitrate of CAN bus")
+    parser.add_argument('--bus-type', default='socketcan', help="Type of the underlying CAN bus")
+    parser.add_argument('--capacity', type=int, default=4096, help="Number of frames kept in the ring")
+    parser.add_argument('--tx-port', type=int, default=0, help="Local port for frame submissions")
+    args = parser.parse_args()
+
+    BusBroker(args.channel, args.bitrate, args.bus_type,
+              capacity=args.capacity, tx_port=args.tx_port).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import functools
+import random
+import time
+import can
+from loguru import logger
+from typing import Dict, List, Optional
+
+DEFAULT_ID_COUNT = 32
+DEFAULT_ID_RANGE = (0x100, 0x6FF)
+
+
+# CRC delimiter, ACK slot, ACK delimiter, end of frame and interframe space,
+# which follow the stuffed part of a frame
+_UNSTUFFED_TAIL_BITS = 13
+_CRC15_POLYNOMIAL = 0x4599
+
+
+def _bits(value: int, length: int) -> List[int]:
+    return [(value >> i) & 1 for i in range(length - 1, -1, -1)]
+
+
+def _crc15(bits: List[int]) -> int:
+    crc = 0
+    for bit in bits:
+        feedback = bit ^ ((crc >> 14) & 1)
+        crc = (crc << 1) & 0x7FFF
+        if feedback:
+            crc ^= _CRC15_POLYNOMIAL
+    return crc
+
+
+def _stuff_bits(bits: List[int]) -> int:
+    count = 0
+    previous, run = bits[0], 1
+    for bit in bits[1:]:
+        if bit == previous:
+            run += 1
+            if run == 5:
+                # The inserted complementary bit starts the next run
+                count += 1
+                previous, run = 1 - bit, 1
+        else:
+            previous, run = bit, 1
+    return count
+
+
+@functools.lru_cache(maxsize=4096)
+def frame_bits(arbitration_id: int, data: bytes, extended_id: bool = False) -> int:
+    """
+    Length of a classic CAN data frame on the wire
+
+    Includes the stuff bits inserted from start of frame up to the CRC, which
+    depend on the ID, data and CRC, and the interframe space.
+
+    Args:
+        arbitration_id: CAN message ID
+        data: Data bytes (at most 8)
+        extended_id: Whether the frame uses an extended CAN ID
+
+    Returns:
+        int: Frame length in bits
+    """
+    dlc = len(data)
+    if extended_id:
+        # SOF, base ID, SRR, IDE, ID extension, RTR, r1, r0
+        bits = ([0] + _bits(arbitration_id >> 18, 11) + [1, 1]
+                + _bits(arbitration_id & 0x3FFFF, 18) + [0, 0, 0])
+    else:
+        # SOF, ID, RTR, IDE, r0
+        bits = [0] + _bits(arbitration_id, 11) + [0, 0, 0]
+    bits += _bits(dlc, 4)
+    for byte in data:
+        bits += _bits(byte, 8)
+    bits += _bits(_crc15(bits), 15)
+    return len(bits) + _stuff_bits(bits) + _UNSTUFFED_TAIL_BITS
+
+
+def measure_bus_load(bus: can.BusABC, bitrate: int, duration: float = 1.0) -> float:
+    """
+    Measure the bus load seen by a bus
+
+    Args:
+        bus: python-can bus to receive from
+        bitrate: Bitrate of CAN bus
+        duration: Measurement time in seconds
+
+    Returns:
+        float: Bus load as a fraction of the bitrate
+    """
+    # Discard frames queued before the measurement window
+    while bus.recv(timeout=0) is not None:
+        pass
+
+    bits = 0
+    end = time.monotonic() + duration
+    while (remaining := end - time.monotonic()) > 0:
+        msg = bus.recv(timeout=remaining)
+        if msg is not None and not msg.is_error_frame:
+            bits += frame_bits(msg.arbitration_id, bytes(msg.data[:8]), msg.is_extended_id)
+    return bits / (bitrate * duration)
+
+
+class BusLoadGenerator:
+    """Holds a target bus load with periodic transmission tasks
+
+    Every generated ID gets its own task from bus.send_periodic, which on
+    socketcan is handled by the kernel broadcast manager. Interfaces without
+    native periodic transmission get a Python thread per task from python-can,
+    which cannot hold high loads, so they are refused unless explicitly allowed.
+    Each task cycles
+    through frames whose DLCs are drawn from the DLC distribution, with a
+    period chosen so that the IDs share the load according to their weights.
+    """
+
+    def __init__(self, bus: can.BusABC, bitrate: int, target_load: float,
+                 id_distribution: Optional[Dict[int, float]] = None,
+                 dlc_distribution: Optional[Dict[int, float]] = None,
+                 extended_id: bool = False, frames_per_id: int = 8,
+                 seed: Optional[int] = None, allow_software_tasks: bool = False):
+        """
+        Initialize bus load generator
+
+        Args:
+            bus: python-can bus to transmit on
+            bitrate: Bitrate of CAN bus
+            target_load: Bus load to hold, as a fraction between 0 and 1
+            id_distribution: CAN ID to relative frame rate; defaults to
+                             32 random IDs between 0x100 and 0x6FF with equal rates
+            dlc_distribution: DLC to relative frequency; defaults to 8 byte frames only
+            extended_id: Whether to use extended CAN IDs
+            frames_per_id: Number of frames (drawn from the DLC distribution) each ID cycles through
+            seed: Seed for IDs, DLCs and data, for reproducible traffic
+            allow_software_tasks: Run with python-can's thread based periodic tasks
+                                  when the interface has no native ones
+        """
+        if not 0 < target_load < 1:
+            raise ValueError(f"Target load must be between 0 and 1, got {target_load}")
+
+        rng = random.Random(seed)
+        if id_distribution is None:
+            ids = rng.sample(range(DEFAULT_ID_RANGE[0], DEFAULT_ID_RANGE[1] + 1), DEFAULT_ID_COUNT)
+            id_distribution = {arbitration_id: 1.0 for arbitration_id in ids}
+        if dlc_distribution is None:
+            dlc_distribution = {8: 1.0}
+        for name, distribution in (('ID', id_distribution), ('DLC', dlc_distribution)):
+            if not distribution:
+                raise ValueError(f"{name} distribution must not be empty")
+            if any(not weight > 0 for weight in distribution.values()):
+                raise ValueError(f"{name} distribution weights must be positive")
+        if any(not 0 <= dlc <= 8 for dlc in dlc_distribution):
+            raise ValueError("DLCs must be between 0 and 8")
+
+        self.bus = bus
+        self.bitrate = bitrate
+        self.target_load = target_load
+        self.allow_software_tasks = allow_software_tasks
+        self.tasks: List[can.broadcastmanager.CyclicSendTaskABC] = []
+
+        total_weight = sum(id_distribution.values())
+        dlcs, dlc_weights = zip(*dlc_distribution.items())
+        self.messages: Dict[int, List[can.Message]] = {}
+        bits_per_frame = 0.0
+        for arbitration_id, weight in id_distribution.items():
+            messages = [can.Message(arbitration_id=arbitration_id,
+                                    data=rng.randbytes(dlc),
+                                    is_extended_id=extended_id)
+                        for dlc in rng.choices(dlcs, dlc_weights, k=frames_per_id)]
+            self.messages[arbitration_id] = messages
+            mean_bits = sum(frame_bits(arbitration_id, bytes(msg.data), extended_id)
+                            for msg in messages) / len(messages)
+            bits_per_frame += weight / total_weight * mean_bits
+
+        self.frame_rate = target_load * bitrate / bits_per_frame
+        self.periods = {arbitration_id: total_weight / (weight * self.frame_rate)
+                        for arbitration_id, weight in id_distribution.items()}
+
+    @staticmethod
+    def has_native_periodic_tasks(bus: can.BusABC) -> bool:
+        """
+        Check whether an interface transmits periodic frames without Python threads
+
+        python-can falls back to thread based tasks for every interface that does
+        not override BusABC._send_periodic_internal.
+
+        Args:
+            bus: python-can bus
+
+        Returns:
+            bool: True if send_periodic uses the interface's own scheduling
+        """
+        return type(bus)._send_periodic_internal is not can.BusABC._send_periodic_internal
+
+    def start(self):
+        """
+        Start transmitting
+
+        Raises:
+            RuntimeError: If the interface only offers thread based periodic tasks
+                          and allow_software_tasks is not set
+        """
+        if self.tasks:
+            return
+        # Decided before any task starts, so a refused generator transmits nothing
+        if not self.has_native_periodic_tasks(self.bus):
+            if not self.allow_software_tasks:
+                raise RuntimeError(f"{type(self.bus).__name__} has no native periodic transmission; "
+                                   "pass allow_software_tasks=True to run a Python thread per ID")
+            logger.warning(f"{type(self.bus).__name__} has no native periodic transmission, using "
+                           f"{len(self.messages)} Python threads; the target load may not be reached")
+        for arbitration_id, messages in self.messages.items():
+            self.tasks.append(self.bus.send_periodic(messages, self.periods[arbitration_id],
+                                                     store_task=False))
+        logger.info(f"Started bus load generator: {self.target_load:.0%} load, "
+                    f"{self.frame_rate:.0f} frames/s on {len(self.tasks)} IDs")
+
+    def stop(self):
+        """Stop transmitting"""
+        for task in self.tasks:
+            try:
+                task.stop()
+            except Exception as e:
+                logger.error(f"Error stopping bus load task: {str(e)}")
+        if self.tasks:
+            logger.info("Stopped bus load generator")
+        self.tasks = []
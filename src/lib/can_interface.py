@@ -1,6 +1,8 @@
 import can
 from loguru import logger
 from typing import Optional, Dict, List
+from src.lib.bus_broker import BrokerBus
+from src.lib.bus_load import BusLoadGenerator, measure_bus_load
 
 class CANInterface:
     """Base class for CAN communication"""
@@ -12,17 +14,29 @@ class CANInterface:
         Args:
             channel: CAN interface name
             bitrate: Bitrate of CAN bus
-            bus_type: Type of CAN bus (socketcan, kvaser, etc.)
+            bus_type: Type of CAN bus (socketcan, kvaser, etc.), or 'broker' to
+                      share a channel owned by a BusBroker in another process
         """
+        self.channel = channel
+        self.bitrate = bitrate
+        self.bus_load = None
         try:
-            self.bus = can.interface.Bus(channel=channel, 
-                                       bustype=bus_type,
-                                       bitrate=bitrate)
+            if bus_type == 'broker':
+                self.bus = BrokerBus(channel=channel)
+            else:
+                self.bus = can.interface.Bus(channel=channel, 
+                                           bustype=bus_type,
+                                           bitrate=bitrate)
             logger.info(f"Successfully initialized CAN interface on {channel}")
         except Exception as e:
             logger.error(f"Failed to initialize CAN interface: {str(e)}")
             raise
     
+    @property
+    def shared(self) -> bool:
+        """Whether other processes transmit on this bus through a BusBroker"""
+        return isinstance(self.bus, BrokerBus)
+    
     def send_message(self, arbitration_id: int, data: List[int], extended_id: bool = False) -> bool:
         """
         Send a CAN message
@@ -65,9 +79,56 @@ class CANInterface:
             logger.error(f"Error receiving CAN message: {str(e)}")
             return None
     
+    def set_filters(self, arbitration_ids: List[int], extended_id: bool = False):
+        """
+        Only receive messages with the given IDs
+        
+        Args:
+            arbitration_ids: CAN message IDs to receive, or an empty list to receive all
+            extended_id: Whether the IDs are extended CAN IDs
+        """
+        mask = 0x1FFFFFFF if extended_id else 0x7FF
+        self.bus.set_filters([{'can_id': arbitration_id, 'can_mask': mask, 'extended': extended_id}
+                              for arbitration_id in arbitration_ids] or None)
+        
+    def start_bus_load(self, target_load: float, **kwargs) -> BusLoadGenerator:
+        """
+        Start generating background traffic at a target bus load
+        
+        Args:
+            target_load: Bus load to hold, as a fraction between 0 and 1
+            **kwargs: ID and DLC distributions and other BusLoadGenerator options
+            
+        Returns:
+            The running bus load generator
+        """
+        self.stop_bus_load()
+        self.bus_load = BusLoadGenerator(self.bus, self.bitrate, target_load, **kwargs)
+        self.bus_load.start()
+        return self.bus_load
+        
+    def stop_bus_load(self):
+        """Stop generating background traffic"""
+        if self.bus_load is not None:
+            self.bus_load.stop()
+            self.bus_load = None
+            
+    def measure_bus_load(self, duration: float = 1.0) -> float:
+        """
+        Measure the load of received traffic
+        
+        Args:
+            duration: Measurement time in seconds
+            
+        Returns:
+            float: Bus load as a fraction of the bitrate
+        """
+        return measure_bus_load(self.bus, self.bitrate, duration)
+    
     def close(self):
         """Close the CAN interface"""
         try:
+            self.stop_bus_load()
             self.bus.shutdown()
             logger.info("CAN interface closed successfully")
         except Exception as e:
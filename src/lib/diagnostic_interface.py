@@ -1,19 +1,72 @@
+import time
 from loguru import logger
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_SESSION = 0x01
+
+# Services that change the session or security level; the tracked values are
+# unknown from the moment such a request is sent until its positive response
+_SESSION_SERVICES = {0x10, 0x11}
+_SECURITY_SERVICES = {0x10, 0x11, 0x27}
+
+class ECUState:
+    """Last known diagnostic state of an ECU"""
+    
+    def __init__(self):
+        self.session = None           # Active diagnostic session, None if unknown
+        self.security_level = None    # Unlocked security level, None if locked
+        self.last_activity = 0.0      # Time of the last positive response
+        
+    def forget(self):
+        """Mark the whole state as unknown"""
+        self.session = None
+        self.security_level = None
+        
+    def reset(self):
+        """Return to the state of a freshly started ECU"""
+        self.session = DEFAULT_SESSION
+        self.security_level = None
+        
+    def expire(self, s3_timeout: float):
+        """
+        Fall back to the default session if the S3 timer has elapsed
+        
+        Args:
+            s3_timeout: Time in seconds a non-default session survives without requests
+        """
+        if self.session not in (None, DEFAULT_SESSION) and \
+                time.monotonic() - self.last_activity > s3_timeout:
+            logger.debug(f"Session {hex(self.session)} expired after S3 timeout")
+            self.session = DEFAULT_SESSION
+            self.security_level = None
 
 class DiagnosticInterface:
     """Base class for diagnostic communication"""
     
-    def __init__(self, can_interface):
+    # ECU states shared by all interfaces in this process, keyed by CAN channel
+    # and ECU response ID, so that state established by one test is known to the next
+    ecu_states: Dict[Tuple[Optional[str], int], ECUState] = {}
+    
+    def __init__(self, can_interface, s3_timeout: float = 5.0):
         """
         Initialize diagnostic interface
         
         Args:
             can_interface: CAN interface instance
+            s3_timeout: Time in seconds the ECU keeps a non-default session without requests
         """
         self.can_interface = can_interface
         self.tester_id = 0x7E0  # Default tester ID
         self.ecu_id = 0x7E8    # Default ECU response ID
+        self.request_timings: List[Dict[str, Any]] = []  # Per-request send time and response latency
+        self._pending_request = None
+        self.s3_timeout = s3_timeout
+        
+    @property
+    def ecu_state(self) -> ECUState:
+        """Tracked state of the ECU currently addressed"""
+        key = (getattr(self.can_interface, 'channel', None), self.ecu_id)
+        return self.ecu_states.setdefault(key, ECUState())
         
     def send_diagnostic_request(self, service_id: int, sub_function: int = None,
                               data: List[int] = None) -> bool:
@@ -40,7 +93,22 @@ class DiagnosticInterface:
         while len(message_data) < 8:
             message_data.append(0x00)
             
-        return self.can_interface.send_message(self.tester_id, message_data)
+        timing = {'service_id': service_id, 'sub_function': sub_function,
+                  'timestamp': time.time(), 'duration': None, 'success': False}
+        self.request_timings.append(timing)
+        
+        state = self.ecu_state
+        if service_id in _SESSION_SERVICES:
+            state.session = None
+        if service_id in _SECURITY_SERVICES:
+            state.security_level = None
+            
+        if not self.can_interface.send_message(self.tester_id, message_data):
+            self._pending_request = None
+            return False
+            
+        self._pending_request = (timing, time.perf_counter())
+        return True
         
     def receive_diagnostic_response(self, timeout: float = 1.0) -> Tuple[bool, Optional[List[int]]]:
         """
@@ -56,6 +124,14 @@ class DiagnosticInterface:
         """
         msg = self.can_interface.receive_message(timeout)
         
+        request = None
+        if self._pending_request is not None:
+            request, sent_at = self._pending_request
+            self._pending_request = None
+            if msg is not None and msg.arbitration_id == self.ecu_id:
+                request['duration'] = time.perf_counter() - sent_at
+                request['success'] = True
+        
         if msg is None:
             logger.warning("No diagnostic response received")
             return False, None
@@ -64,8 +140,55 @@ class DiagnosticInterface:
             logger.warning(f"Received message with unexpected ID: {hex(msg.arbitration_id)}")
             return False, None
             
+        if request is not None:
+            self._track_state(request['service_id'], request['sub_function'], list(msg.data))
+            
         return True, list(msg.data)
         
+    def get_timing_statistics(self) -> Dict[str, Any]:
+        """
+        Summarise latency and loss of the requests in request_timings
+        
+        Returns:
+            Dictionary with requests, lost, loss_rate and min, mean, p95, p99
+            and max latency in seconds (None if no response was received)
+        """
+        latencies = sorted(t['duration'] for t in self.request_timings if t['success'])
+        requests = len(self.request_timings)
+        lost = requests - len(latencies)
+        
+        def percentile(fraction):
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else None
+        
+        return {
+            'requests': requests,
+            'lost': lost,
+            'loss_rate': lost / requests if requests else 0.0,
+            'min_latency': latencies[0] if latencies else None,
+            'mean_latency': sum(latencies) / len(latencies) if latencies else None,
+            'p95_latency': percentile(0.95),
+            'p99_latency': percentile(0.99),
+            'max_latency': latencies[-1] if latencies else None,
+        }
+        
+    def _track_state(self, service_id: int, sub_function: Optional[int], response: List[int]):
+        """Update the tracked ECU state from a response to a request"""
+        if len(response) >= 2 and response[0] == 0x7F and response[1] == 0x27:
+            self.ecu_state.security_level = None
+            return
+        if not response or response[0] != service_id + 0x40:
+            return
+            
+        state = self.ecu_state
+        state.last_activity = time.monotonic()
+        if service_id == 0x10:
+            state.session = sub_function & 0x7F
+            state.security_level = None
+        elif service_id == 0x27 and sub_function % 2 == 0:
+            state.security_level = sub_function // 2
+        elif service_id == 0x11:
+            state.reset()
+        
     def set_ids(self, tester_id: int, ecu_id: int):
         """
         Set custom tester and ECU IDs
@@ -124,4 +247,129 @@ class DiagnosticInterface:
         if not success or response[0] != service_id + 0x40:  # Check positive response
             return False
             
+        return True
+        
+    def diagnostic_session_control(self, session: int) -> bool:
+        """
+        Switch diagnostic session (Service 0x10)
+        
+        Args:
+            session: Diagnostic session type
+            
+        Returns:
+            bool: True if session switched
+        """
+        service_id = 0x10
+        if not self.send_diagnostic_request(service_id, session):
+            return False
+            
+        success, response = self.receive_diagnostic_response()
+        return success and response[0] == service_id + 0x40
+        
+    def security_access(self, level: int, key_function: Callable[[List[int]], List[int]]) -> bool:
+        """
+        Unlock a security level (Service 0x27)
+        
+        Args:
+            level: Security access level
+            key_function: Function calculating the key from the seed
+            
+        Returns:
+            bool: True if the level was unlocked
+        """
+        service_id = 0x27
+        if not self.send_diagnostic_request(service_id, 2 * level - 1):
+            return False
+            
+        success, response = self.receive_diagnostic_response()
+        if not success or response[0] != service_id + 0x40:
+            return False
+            
+        if not self.send_diagnostic_request(service_id, 2 * level, key_function(response[2:])):
+            return False
+            
+        success, response = self.receive_diagnostic_response()
+        return success and response[0] == service_id + 0x40
+        
+    def ecu_reset(self, reset_type: int = 0x01) -> bool:
+        """
+        Reset the ECU (Service 0x11)
+        
+        Args:
+            reset_type: Reset type, hard reset by default
+            
+        Returns:
+            bool: True if the ECU accepted the reset
+        """
+        service_id = 0x11
+        if not self.send_diagnostic_request(service_id, reset_type):
+            return False
+            
+        success, response = self.receive_diagnostic_response()
+        return success and response[0] == service_id + 0x40
+        
+    def clear_dtcs(self, group: int = 0xFFFFFF) -> bool:
+        """
+        Clear diagnostic information (Service 0x14)
+        
+        Args:
+            group: DTC group to clear, all groups by default
+            
+        Returns:
+            bool: True if DTCs were cleared
+        """
+        service_id = 0x14
+        data = [(group >> 16) & 0xFF, (group >> 8) & 0xFF, group & 0xFF]
+        if not self.send_diagnostic_request(service_id, data=data):
+            return False
+            
+        success, response = self.receive_diagnostic_response()
+        return success and response[0] == service_id + 0x40
+        
+    def ensure_state(self, session: int = None, security_level: int = None,
+                     dtcs_cleared: bool = False,
+                     key_function: Callable[[List[int]], List[int]] = None) -> bool:
+        """
+        Bring the ECU into a state, skipping transitions already satisfied
+        
+        The tracked state only covers requests sent from this process. On a bus
+        shared with other processes (bus_type 'broker') another tester may have
+        changed the ECU state, so no transition is skipped there. DTCs are always
+        cleared when required, since the ECU sets them again by itself whenever
+        a fault is detected.
+        
+        Args:
+            session: Required diagnostic session
+            security_level: Required unlocked security level
+            dtcs_cleared: Whether DTCs must be cleared
+            key_function: Function calculating the key from the seed, needed for security_level
+            
+        Returns:
+            bool: True if the ECU is in the required state
+        """
+        state = self.ecu_state
+        state.expire(self.s3_timeout)
+        if getattr(self.can_interface, 'shared', False):
+            state.forget()
+        
+        if session is not None and state.session != session:
+            if not self.diagnostic_session_control(session):
+                logger.error(f"Failed to switch to session {hex(session)}")
+                return False
+        elif session is not None:
+            logger.debug(f"Already in session {hex(session)}")
+            
+        if security_level is not None and state.security_level != security_level:
+            if key_function is None:
+                raise ValueError("key_function is required to unlock a security level")
+            if not self.security_access(security_level, key_function):
+                logger.error(f"Failed to unlock security level {security_level}")
+                return False
+        elif security_level is not None:
+            logger.debug(f"Security level {security_level} already unlocked")
+            
+        if dtcs_cleared and not self.clear_dtcs():
+            logger.error("Failed to clear DTCs")
+            return False
+            
         return True
\ No newline at end of file
@@ -0,0 +1,279 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from loguru import logger
+from typing import Any, Dict, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS test_results (
+    id TEXT PRIMARY KEY,
+    test_name TEXT NOT NULL,
+    ecu TEXT,
+    firmware_version TEXT,
+    start_time REAL NOT NULL,
+    duration REAL,
+    result TEXT
+);
+CREATE TABLE IF NOT EXISTS test_data (
+    result_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS request_timings (
+    result_id TEXT NOT NULL,
+    service_id INTEGER NOT NULL,
+    sub_function INTEGER,
+    timestamp REAL NOT NULL,
+    duration REAL,
+    success INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_test ON test_results (test_name, start_time, duration, result);
+CREATE INDEX IF NOT EXISTS idx_results_test_ecu
+    ON test_results (test_name, ecu, start_time, duration, result, firmware_version);
+CREATE INDEX IF NOT EXISTS idx_results_test_firmware
+    ON test_results (test_name, firmware_version, start_time, duration, result, ecu);
+CREATE INDEX IF NOT EXISTS idx_results_start ON test_results (start_time);
+CREATE INDEX IF NOT EXISTS idx_results_ecu ON test_results (ecu, start_time);
+CREATE INDEX IF NOT EXISTS idx_results_firmware ON test_results (firmware_version, start_time);
+CREATE INDEX IF NOT EXISTS idx_test_data_result ON test_data (result_id);
+CREATE INDEX IF NOT EXISTS idx_timings_result ON request_timings (result_id);
+"""
+
+_STOP = object()
+
+
+class ResultsStore:
+    """SQLite store for test results with a background batched writer
+
+    record() only enqueues, so tests never wait on disk. A writer thread
+    collects records for up to flush_interval seconds (or batch_size records)
+    and commits them in a single transaction.
+    """
+
+    def __init__(self, path: str = 'test_results.db', batch_size: int = 500,
+                 flush_interval: float = 1.0):
+        """
+        Open or create a results store
+
+        Args:
+            path: SQLite database file
+            batch_size: Maximum number of test results written per transaction
+            flush_interval: Maximum time in seconds a result waits before being written
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._read_conn = sqlite3.connect(path, check_same_thread=False)
+        self._read_conn.row_factory = sqlite3.Row
+        self._read_conn.execute("PRAGMA journal_mode=WAL")
+        self._read_conn.executescript(_SCHEMA)
+        self._read_lock = threading.Lock()
+
+        self._closed = False
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        logger.info(f"Opened results store {path}")
+
+    def record(self, test_name: str, start_time: float, duration: Optional[float] = None,
+               result: Optional[str] = None, ecu: Optional[str] = None,
+               firmware_version: Optional[str] = None, test_data: Optional[Dict[str, Any]] = None,
+               request_timings: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        Queue a test result for writing
+
+        Args:
+            test_name: Test identifier
+            start_time: Test start as a Unix timestamp
+            duration: Test duration in seconds
+            result: Test outcome (passed, failed, skipped)
+            ecu: ECU under test
+            firmware_version: Firmware version of the ECU under test
+            test_data: Data stored by the test through set_test_data
+            request_timings: Diagnostic request timings recorded during the test
+
+        Returns:
+            str: ID of the queued result
+
+        Raises:
+            RuntimeError: If the store has been closed
+            ValueError: If the test data cannot be encoded as JSON
+            KeyError: If a request timing is missing a field
+        """
+        if self._closed:
+            raise RuntimeError(f"Results store {self.path} is closed")
+        result_id = uuid.uuid4().hex
+        # Encode here, so the stored data is a snapshot and a bad payload fails
+        # in the test that produced it rather than dropping the writer's batch
+        data = [(result_id, key, json.dumps(value, default=str))
+                for key, value in (test_data or {}).items()]
+        timings = [(result_id, t['service_id'], t.get('sub_function'), t['timestamp'],
+                    t.get('duration'), int(t['success']))
+                   for t in request_timings or []]
+        self._queue.put(((result_id, test_name, ecu, firmware_version, start_time,
+                          duration, result), data, timings))
+        return result_id
+
+    def _write_loop(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        running = True
+        while running:
+            item = self._queue.get()
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while item is not _STOP and not isinstance(item, threading.Event) \
+                    and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            records = [item for item in batch
+                       if item is not _STOP and not isinstance(item, threading.Event)]
+            if records:
+                try:
+                    self._write_batch(conn, records)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(records)} test results: {str(e)}")
+            for item in batch:
+                if item is _STOP:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    item.set()
+        conn.close()
+
+    @staticmethod
+    def _write_batch(conn: sqlite3.Connection, records: List[tuple]):
+        results, data, timings = [], [], []
+        for row, record_data, record_timings in records:
+            results.append(row)
+            data.extend(record_data)
+            timings.extend(record_timings)
+        with conn:
+            conn.executemany("INSERT INTO test_results VALUES (?, ?, ?, ?, ?, ?, ?)", results)
+            conn.executemany("INSERT INTO test_data VALUES (?, ?, ?)", data)
+            conn.executemany("INSERT INTO request_timings VALUES (?, ?, ?, ?, ?, ?)", timings)
+        logger.debug(f"Wrote {len(results)} test results")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until all queued results are written
+
+        Args:
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            bool: True if all results were written
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Write all queued results and close the store"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._read_conn.close()
+        logger.info(f"Closed results store {self.path}")
+
+    def _query(self, sql: str, params: list) -> List[Dict[str, Any]]:
+        with self._read_lock:
+            return [dict(row) for row in self._read_conn.execute(sql, params)]
+
+    @staticmethod
+    def _filters(ecu: Optional[str], firmware_version: Optional[str], test_name: Optional[str],
+                 since: Optional[float], until: Optional[float]) -> tuple:
+        clauses, params = [], []
+        for column, value in (('test_name', test_name), ('ecu', ecu),
+                              ('firmware_version', firmware_version)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("start_time >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("start_time < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query_results(self, ecu: Optional[str] = None, firmware_version: Optional[str] = None,
+                      test_name: Optional[str] = None, since: Optional[float] = None,
+                      until: Optional[float] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Query stored test results, newest first
+
+        Args:
+            ecu: Only return results for this ECU
+            firmware_version: Only return results for this firmware version
+            test_name: Only return results for this test
+            since: Only return results started at or after this Unix timestamp
+            until: Only return results started before this Unix timestamp
+            limit: Maximum number of results
+
+        Returns:
+            List of result rows as dictionaries
+        """
+        where, params = self._filters(ecu, firmware_version, test_name, since, until)
+        return self._query(f"SELECT * FROM test_results{where} ORDER BY start_time DESC LIMIT ?",
+                           params + [limit])
+
+    def duration_trend(self, test_name: str, ecu: Optional[str] = None,
+                       firmware_version: Optional[str] = None, since: Optional[float] = None,
+                       until: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Get daily duration and pass rate statistics for a test
+
+        Args:
+            test_name: Test identifier
+            ecu: Only include results for this ECU
+            firmware_version: Only include results for this firmware version
+            since: Only include results started at or after this Unix timestamp
+            until: Only include results started before this Unix timestamp
+
+        Returns:
+            List of dictionaries with day, runs, passed, avg_duration and max_duration
+        """
+        where, params = self._filters(ecu, firmware_version, test_name, since, until)
+        return self._query(
+            "SELECT date(start_time, 'unixepoch') AS day, COUNT(*) AS runs, "
+            "SUM(result = 'passed') AS passed, AVG(duration) AS avg_duration, "
+            f"MAX(duration) AS max_duration FROM test_results{where} "
+            "GROUP BY day ORDER BY day", params)
+
+    def get_test_data(self, result_id: str) -> Dict[str, Any]:
+        """
+        Get the test data stored with a result
+
+        Args:
+            result_id: ID returned by record()
+
+        Returns:
+            Dictionary of test data
+        """
+        rows = self._query("SELECT key, value FROM test_data WHERE result_id = ?", [result_id])
+        return {row['key']: json.loads(row['value']) for row in rows}
+
+    def get_request_timings(self, result_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the diagnostic request timings stored with a result
+
+        Args:
+            result_id: ID returned by record()
+
+        Returns:
+            List of request timings ordered by time
+        """
+        return self._query("SELECT service_id, sub_function, timestamp, duration, success "
+                           "FROM request_timings WHERE result_id = ? ORDER BY timestamp",
+                           [result_id])
@@ -1,20 +1,26 @@
 import pytest
 from loguru import logger
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 class TestBase:
     """Base class for all test cases"""
     
-    def __init__(self):
+    results_store = None     # ResultsStore that receives every finished test, if any
+    ecu = None               # ECU under test, recorded with the results
+    firmware_version = None  # Firmware version under test, recorded with the results
+    key_function: Optional[Callable[[List[int]], List[int]]] = None  # Seed to key, set by --key-function
+    
+    def setup_method(self, method):
+        """Setup method called before each test method"""
+        # State is initialised here rather than in __init__, since pytest
+        # refuses to collect test classes that define a constructor
         self.test_name = self.__class__.__name__
-        self.start_time = None
+        self.test_method = method.__name__
         self.end_time = None
         self.test_result = None
+        self.test_node_id = None  # pytest node ID, set by conftest; includes parametrization
         self.test_data = {}
-        
-    def setup_method(self, method):
-        """Setup method called before each test method"""
         self.start_time = datetime.now()
         logger.info(f"Starting test: {self.test_name}")
         self.setup()
@@ -26,6 +32,17 @@ class TestBase:
         duration = (self.end_time - self.start_time).total_seconds()
         logger.info(f"Test {self.test_name} completed in {duration:.2f} seconds")
         
+        if self.results_store is not None:
+            diag_interface = getattr(self, 'diag_interface', None)
+            self.results_store.record(self.test_node_id or f"{self.test_name}.{self.test_method}",
+                                      self.start_time.timestamp(),
+                                      duration=duration,
+                                      result=self.test_result,
+                                      ecu=self.ecu,
+                                      firmware_version=self.firmware_version,
+                                      test_data=self.test_data,
+                                      request_timings=getattr(diag_interface, 'request_timings', None))
+        
     def setup(self):
         """
         Setup method to be implemented by test cases
@@ -40,6 +57,76 @@ class TestBase:
         """
         pass
     
+    @staticmethod
+    def required_ecu_state(node) -> Dict[str, Any]:
+        """
+        Get the ECU state a test declares with the ecu_state marker
+        
+        The marker can be applied to the module, the class and the test method,
+        e.g. @pytest.mark.ecu_state(session=0x03, security_level=1, dtcs_cleared=True).
+        Closer markers override the ones further out.
+        
+        Args:
+            node: pytest item of the test
+            
+        Returns:
+            Keyword arguments for DiagnosticInterface.ensure_state
+        """
+        state = {}
+        for mark in reversed(list(node.iter_markers('ecu_state'))):
+            state.update(mark.kwargs)
+        return state
+        
+    @staticmethod
+    def ecu_state_order(node) -> tuple:
+        """
+        Sort key grouping tests by required ECU state
+        
+        Tests without requirements run first and tests marked with
+        ecu_state_destructive (e.g. security lockout) run last.
+        
+        Args:
+            node: pytest item of the test
+            
+        Returns:
+            Sort key for the test
+        """
+        state = TestBase.required_ecu_state(node)
+        return (node.get_closest_marker('ecu_state_destructive') is not None, bool(state),
+                state.get('session') or 0, state.get('security_level') or 0,
+                bool(state.get('dtcs_cleared')))
+        
+    def establish_ecu_state(self, state: Dict[str, Any]):
+        """
+        Bring the ECU into the state a test requires
+        
+        Args:
+            state: Keyword arguments for DiagnosticInterface.ensure_state
+        """
+        if state and not self.diag_interface.ensure_state(key_function=self.calculate_key, **state):
+            pytest.fail(f"Could not bring ECU into required state {state}")
+        
+    def calculate_key(self, seed_data: list) -> list:
+        """
+        Calculate key from seed with the configured key function
+        
+        Suites override this method, or configure the ECU's algorithm for all
+        suites with --key-function.
+        
+        Args:
+            seed_data: Seed received from ECU
+            
+        Returns:
+            Calculated key bytes
+            
+        Raises:
+            NotImplementedError: If no key function is configured
+        """
+        if TestBase.key_function is None:
+            raise NotImplementedError(f"{self.test_name} needs a security access key: override "
+                                      "calculate_key or pass --key-function module:function")
+        return TestBase.key_function(seed_data)
+        
     def set_test_data(self, key: str, value: Any):
         """
         Store test-specific data
@@ -0,0 +1,182 @@
+import threading
+import time
+import uuid
+import can
+import pytest
+from src.lib.bus_broker import BROKER_ORIGIN, BrokerBus, BusBroker, SharedFrameRing
+
+
+@pytest.fixture
+def ring_name():
+    return f"atf_test_{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def broker():
+    broker = BusBroker(f"test_{uuid.uuid4().hex[:8]}", bus_type='virtual', capacity=8)
+    broker.start()
+    yield broker
+    broker.stop()
+
+
+def frame(arbitration_id: int, data=b'\x01\x02', **kwargs) -> can.Message:
+    return can.Message(arbitration_id=arbitration_id, data=data, **kwargs)
+
+
+class TestSharedFrameRing:
+    """Test cases for the shared memory frame ring"""
+
+    def test_header_round_trip(self, ring_name):
+        """Test that a client sees the header written by the broker"""
+        owner = SharedFrameRing(ring_name, capacity=16, create=True, tx_port=4242, authkey=b'k' * 32)
+        client = SharedFrameRing(ring_name)
+        try:
+            assert (client.capacity, client.tx_port, client.authkey) == (16, 4242, b'k' * 32)
+        finally:
+            client.close()
+            owner.close()
+
+    def test_write_read(self, ring_name):
+        """Test that a frame and its flags read back unchanged"""
+        ring = SharedFrameRing(ring_name, capacity=4, create=True)
+        try:
+            msg = frame(0x18DAF110, data=bytes(range(12)), timestamp=12.5, is_extended_id=True,
+                        is_fd=True, bitrate_switch=True, error_state_indicator=True)
+            ring.write(msg, origin=3)
+
+            status, (timestamp, arbitration_id, origin, flags, data) = ring.read(1)
+            assert status == 'ok'
+            assert (timestamp, arbitration_id, origin, data) == (12.5, 0x18DAF110, 3, bytes(range(12)))
+            assert flags == 0x01 | 0x08 | 0x10 | 0x20
+            assert ring.read(2) == ('pending', None)
+        finally:
+            ring.close()
+
+    def test_overrun(self, ring_name):
+        """Test that overwritten frames are reported as overrun"""
+        ring = SharedFrameRing(ring_name, capacity=4, create=True)
+        try:
+            for i in range(6):
+                ring.write(frame(i))
+
+            assert ring.head == 6
+            assert ring.read(1)[0] == 'overrun'
+            assert ring.read(2)[0] == 'overrun'
+            status, data = ring.read(3)
+            assert status == 'ok' and data[1] == 2
+            assert ring.read(7)[0] == 'pending'
+        finally:
+            ring.close()
+
+
+class TestBrokerBus:
+    """Test cases for sharing a bus through the broker"""
+
+    def test_resync_after_overrun(self, broker):
+        """Test that a slow reader skips to the oldest frame still in the ring"""
+        client = BrokerBus(broker.channel)
+        try:
+            for i in range(20):
+                broker._publish(frame(i), BROKER_ORIGIN)
+
+            ids = []
+            while (msg := client.recv(timeout=0.05)) is not None:
+                ids.append(msg.arbitration_id)
+            assert ids == list(range(12, 20))
+            assert client.dropped_frames == 12
+        finally:
+            client.shutdown()
+
+    def test_own_frames_filtered(self, broker):
+        """Test that a client does not receive its own frames but others do"""
+        sender = BrokerBus(broker.channel)
+        listener = BrokerBus(broker.channel)
+        try:
+            sender.send(frame(0x7E0))
+            assert sender.recv(timeout=0.1) is None
+            msg = listener.recv(timeout=1.0)
+            assert msg is not None and msg.arbitration_id == 0x7E0
+        finally:
+            sender.shutdown()
+            listener.shutdown()
+
+    def test_send_error_keeps_connection(self, broker, monkeypatch):
+        """Test that a failed send raises and later sends still work"""
+        client = BrokerBus(broker.channel)
+        send = broker.bus.send
+
+        def failing_send(msg):
+            raise ValueError("bad frame")
+
+        try:
+            monkeypatch.setattr(broker.bus, 'send', failing_send)
+            with pytest.raises(can.CanOperationError, match="bad frame"):
+                client.send(frame(0x100))
+
+            monkeypatch.setattr(broker.bus, 'send', send)
+            client.send(frame(0x101))
+        finally:
+            client.shutdown()
+
+    def test_stale_reply_skipped(self, broker, monkeypatch):
+        """Test that the reply to a timed out send is not taken for the next one"""
+        client = BrokerBus(broker.channel)
+        send = broker.bus.send
+
+        def failing_slow_send(msg):
+            time.sleep(0.3)
+            raise can.CanError("slow failure")
+
+        try:
+            monkeypatch.setattr(broker.bus, 'send', failing_slow_send)
+            with pytest.raises(can.CanOperationError, match="Timed out"):
+                client.send(frame(0x100), timeout=0.05)
+
+            monkeypatch.setattr(broker.bus, 'send', send)
+            client.send(frame(0x101), timeout=2.0)
+        finally:
+            client.shutdown()
+
+    def test_unauthenticated_client_rejected(self, broker):
+        """Test that the broker requires the key from the ring"""
+        from multiprocessing import AuthenticationError
+        from multiprocessing.connection import Client
+
+        with pytest.raises(AuthenticationError):
+            Client(('127.0.0.1', broker.ring.tx_port), authkey=b'wrong')
+
+    def test_sends_serialized(self, broker, monkeypatch):
+        """Test that sends from several clients never run concurrently on the bus"""
+        clients = [BrokerBus(broker.channel) for _ in range(4)]
+        send = broker.bus.send
+        active, overlaps = [0], []
+
+        def slow_send(msg):
+            active[0] += 1
+            overlaps.append(active[0])
+            time.sleep(0.01)
+            active[0] -= 1
+            send(msg)
+
+        try:
+            monkeypatch.setattr(broker.bus, 'send', slow_send)
+            threads = [threading.Thread(target=client.send, args=(frame(0x100 + i),))
+                       for i, client in enumerate(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert len(overlaps) == 4 and max(overlaps) == 1
+        finally:
+            for client in clients:
+                client.shutdown()
+
+    def test_send_after_broker_stopped(self, broker):
+        """Test that losing the broker raises a python-can error"""
+        client = BrokerBus(broker.channel)
+        try:
+            broker.stop()
+            with pytest.raises(can.CanOperationError, match="Lost connection"):
+                client.send(frame(0x100), timeout=1.0)
+        finally:
+            client.shutdown()
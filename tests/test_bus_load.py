@@ -0,0 +1,66 @@
+import pytest
+from src.lib.test_base import TestBase
+from src.lib.can_interface import CANInterface
+from src.lib.diagnostic_interface import DiagnosticInterface
+import time
+
+BUS_LOADS = [0.3, 0.6, 0.9]
+
+class TestDiagnosticsUnderLoad(TestBase):
+    """Test cases for diagnostic timing at production bus loads"""
+
+    REQUEST_COUNT = 200
+    P2_SERVER_MAX = 0.050  # Maximum ECU response time in seconds
+    ACTIVE_SESSION_DID = 0xF186  # Standard DID for active diagnostic session
+
+    def setup(self):
+        """Test setup - initialize interfaces"""
+        self.can_interface = CANInterface(
+            channel='can0',
+            bitrate=500000
+        )
+        self.diag_interface = DiagnosticInterface(self.can_interface)
+
+        # Keep generated traffic out of the diagnostic receive path
+        self.can_interface.set_filters([self.diag_interface.ecu_id])
+
+    def teardown(self):
+        """Test cleanup"""
+        if hasattr(self, 'can_interface'):
+            self.can_interface.stop_bus_load()
+            self.can_interface.close()
+
+    @pytest.mark.parametrize('load', BUS_LOADS)
+    def test_generated_bus_load(self, load):
+        """Test that the generator holds the target bus load"""
+        monitor = CANInterface(channel='can0', bitrate=500000)
+        try:
+            self.can_interface.start_bus_load(load, seed=0)
+            time.sleep(0.5)  # Let the load settle
+
+            measured = monitor.measure_bus_load(duration=2.0)
+            self.set_test_data('measured_bus_load', measured)
+        finally:
+            self.can_interface.stop_bus_load()
+            monitor.close()
+
+        assert abs(measured - load) <= 0.05, f"Bus load {measured:.1%} instead of {load:.0%}"
+
+    @pytest.mark.parametrize('load', BUS_LOADS)
+    def test_diagnostic_timing_under_load(self, load):
+        """Test diagnostic response latency and loss under bus load"""
+        self.can_interface.start_bus_load(load, seed=0)
+        time.sleep(0.5)  # Let the load settle
+
+        self.diag_interface.request_timings.clear()
+        for _ in range(self.REQUEST_COUNT):
+            self.diag_interface.read_data_by_identifier(self.ACTIVE_SESSION_DID)
+        self.can_interface.stop_bus_load()
+
+        stats = self.diag_interface.get_timing_statistics()
+        self.set_test_data('bus_load', load)
+        self.set_test_data('diagnostic_timing', stats)
+
+        self.validate_response(stats['lost'], 0, "Lost diagnostic responses")
+        assert stats['max_latency'] <= self.P2_SERVER_MAX, \
+            f"Response latency {stats['max_latency'] * 1000:.1f} ms exceeds P2 server max"
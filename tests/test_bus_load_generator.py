@@ -0,0 +1,83 @@
+import random
+import can
+import pytest
+from src.lib.bus_load import BusLoadGenerator, frame_bits
+
+
+@pytest.fixture
+def bus():
+    bus = can.Bus(channel='bus_load_generator', interface='virtual')
+    yield bus
+    bus.shutdown()
+
+
+class TestFrameBits:
+    """Test cases for the on-wire frame length"""
+
+    @pytest.mark.parametrize('extended_id', [False, True])
+    def test_within_stuffing_bounds(self, extended_id):
+        """Test that stuff bits stay between none and the worst case"""
+        rng = random.Random(0)
+        for _ in range(2000):
+            dlc = rng.randint(0, 8)
+            arbitration_id = rng.getrandbits(29 if extended_id else 11)
+            nominal = (67 if extended_id else 47) + 8 * dlc
+            worst_case = ((54 if extended_id else 34) + 8 * dlc - 1) // 4
+            bits = frame_bits(arbitration_id, rng.randbytes(dlc), extended_id)
+            assert nominal <= bits <= nominal + worst_case
+
+    def test_stuffing_depends_on_data(self):
+        """Test that runs of equal bits add stuff bits"""
+        assert frame_bits(0x555, b'\x00' * 8) > frame_bits(0x555, b'\x55' * 8)
+
+
+class TestBusLoadGenerator:
+    """Test cases for holding a target bus load"""
+
+    @pytest.mark.parametrize('load', [0.3, 0.9])
+    def test_periods_match_target_load(self, bus, load):
+        """Test that the task periods add up to the target load"""
+        generator = BusLoadGenerator(bus, 500000, load, dlc_distribution={0: 1, 4: 1, 8: 2},
+                                     id_distribution={0x100: 3.0, 0x200: 1.0}, seed=1)
+        bits_per_second = sum(
+            sum(frame_bits(msg.arbitration_id, bytes(msg.data)) for msg in messages)
+            / len(messages) / generator.periods[arbitration_id]
+            for arbitration_id, messages in generator.messages.items())
+        assert bits_per_second / 500000 == pytest.approx(load)
+        assert generator.periods[0x200] > generator.periods[0x100]
+
+    def test_invalid_load(self, bus):
+        """Test that loads outside 0-100% are rejected"""
+        with pytest.raises(ValueError):
+            BusLoadGenerator(bus, 500000, 1.2)
+
+    @pytest.mark.parametrize('distributions', [{'id_distribution': {}},
+                                               {'id_distribution': {0x100: 0.0}},
+                                               {'id_distribution': {0x100: 1.0, 0x200: -1.0}},
+                                               {'dlc_distribution': {}},
+                                               {'dlc_distribution': {8: 0}}])
+    def test_invalid_distribution(self, bus, distributions):
+        """Test that empty distributions and non-positive weights are rejected"""
+        with pytest.raises(ValueError, match="distribution"):
+            BusLoadGenerator(bus, 500000, 0.3, **distributions)
+
+    def test_software_tasks_refused(self, bus):
+        """Test that thread based periodic tasks are refused before anything is sent"""
+        node = can.Bus(channel='bus_load_generator', interface='virtual')
+        try:
+            generator = BusLoadGenerator(bus, 500000, 0.3, seed=0)
+            with pytest.raises(RuntimeError):
+                generator.start()
+            assert generator.tasks == []
+            assert node.recv(timeout=0.2) is None
+        finally:
+            node.shutdown()
+
+    def test_software_tasks_allowed(self, bus):
+        """Test that thread based periodic tasks run when explicitly allowed"""
+        generator = BusLoadGenerator(bus, 500000, 0.3, seed=0, allow_software_tasks=True)
+        generator.start()
+        try:
+            assert len(generator.tasks) == 32
+        finally:
+            generator.stop()
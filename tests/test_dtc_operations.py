@@ -4,6 +4,7 @@ from src.lib.can_interface import CANInterface
 from src.lib.diagnostic_interface import DiagnosticInterface
 import time
 
+@pytest.mark.ecu_state(session=0x03)
 class TestDTCOperations(TestBase):
     """Test cases for Diagnostic Trouble Code operations"""
     
@@ -0,0 +1,182 @@
+import pytest
+from types import SimpleNamespace
+from src.lib.diagnostic_interface import DEFAULT_SESSION, DiagnosticInterface
+from src.lib.test_base import TestBase
+
+
+class FakeECU:
+    """CAN interface stand-in answering diagnostic requests like an ECU"""
+
+    def __init__(self, channel='can0', shared=False):
+        self.channel = channel
+        self.shared = shared
+        self.requests = []
+        self.responses = []
+        self.negative = {}  # (service ID, sub-function) to NRC
+
+    def send_message(self, arbitration_id, data, extended_id=False):
+        service_id, sub_function = data[0], data[1]
+        self.requests.append((service_id, sub_function))
+        nrc = self.negative.get((service_id, sub_function))
+        if nrc is not None:
+            response = [0x7F, service_id, nrc]
+        elif service_id == 0x27 and sub_function % 2:
+            response = [0x67, sub_function, 0x12, 0x34]
+        else:
+            response = [service_id + 0x40, sub_function]
+        self.responses.append(SimpleNamespace(arbitration_id=0x7E8, data=response))
+        return True
+
+    def receive_message(self, timeout=1.0):
+        return self.responses.pop(0) if self.responses else None
+
+
+@pytest.fixture
+def ecu():
+    DiagnosticInterface.ecu_states.clear()
+    yield FakeECU()
+    DiagnosticInterface.ecu_states.clear()
+
+
+def key(seed):
+    return [x ^ 0xFF for x in seed]
+
+
+class TestECUStateTracking:
+    """Test cases for skipping ECU state transitions that are already satisfied"""
+
+    def test_transitions_done_once(self, ecu):
+        """Test that a satisfied session and security level send no requests"""
+        diag = DiagnosticInterface(ecu)
+        assert diag.ensure_state(session=0x03, security_level=1, dtcs_cleared=True, key_function=key)
+        assert ecu.requests == [(0x10, 0x03), (0x27, 0x01), (0x27, 0x02), (0x14, 0xFF)]
+
+        ecu.requests.clear()
+        assert DiagnosticInterface(ecu).ensure_state(session=0x03, security_level=1,
+                                                     dtcs_cleared=True, key_function=key)
+        assert ecu.requests == [(0x14, 0xFF)]
+
+    def test_unread_session_change_invalidates(self, ecu):
+        """Test that a session change whose response is never read is not trusted"""
+        diag = DiagnosticInterface(ecu)
+        assert diag.ensure_state(session=0x03, security_level=1, key_function=key)
+        diag.send_diagnostic_request(0x10, 0x01)
+        ecu.responses.clear()
+        ecu.requests.clear()
+
+        assert diag.ensure_state(session=0x03, security_level=1, key_function=key)
+        assert ecu.requests == [(0x10, 0x03), (0x27, 0x01), (0x27, 0x02)]
+
+    def test_s3_timeout_expires_session(self, ecu):
+        """Test that a session is re-entered after the S3 timer elapsed"""
+        diag = DiagnosticInterface(ecu, s3_timeout=5.0)
+        assert diag.ensure_state(session=0x03, security_level=1, key_function=key)
+        diag.ecu_state.last_activity -= 10.0
+        ecu.requests.clear()
+
+        assert diag.ensure_state(session=0x03, security_level=1, key_function=key)
+        assert ecu.requests == [(0x10, 0x03), (0x27, 0x01), (0x27, 0x02)]
+
+    def test_dtcs_always_cleared(self, ecu):
+        """Test that DTCs are cleared for every test requiring it, as the ECU sets them itself"""
+        diag = DiagnosticInterface(ecu)
+        assert diag.ensure_state(dtcs_cleared=True)
+        diag.send_diagnostic_request(0x22, data=[0xF1, 0x86])
+        diag.receive_diagnostic_response()
+        ecu.requests.clear()
+
+        assert diag.ensure_state(dtcs_cleared=True)
+        assert ecu.requests == [(0x14, 0xFF)]
+
+    def test_negative_key_response_keeps_security_locked(self, ecu):
+        """Test that a rejected key leaves the tracker locked"""
+        ecu.negative[(0x27, 0x02)] = 0x35
+        diag = DiagnosticInterface(ecu)
+
+        assert not diag.ensure_state(session=0x03, security_level=1, key_function=key)
+        assert diag.ecu_state.session == 0x03
+        assert diag.ecu_state.security_level is None
+
+    def test_reset_returns_to_default_session(self, ecu):
+        """Test that an ECU reset is tracked as the default session"""
+        diag = DiagnosticInterface(ecu)
+        assert diag.ensure_state(session=0x03, security_level=1, key_function=key)
+        assert diag.ecu_reset()
+
+        assert diag.ecu_state.session == DEFAULT_SESSION
+        assert diag.ecu_state.security_level is None
+
+    def test_state_per_channel(self, ecu):
+        """Test that ECUs with the same response ID on different channels are tracked apart"""
+        assert DiagnosticInterface(ecu).ensure_state(session=0x03)
+        other = FakeECU(channel='can1')
+        assert DiagnosticInterface(other).ensure_state(session=0x03)
+        assert other.requests == [(0x10, 0x03)]
+
+    def test_shared_bus_never_skips(self, ecu):
+        """Test that transitions are always sent on a bus shared with other processes"""
+        ecu.shared = True
+        diag = DiagnosticInterface(ecu)
+        assert diag.ensure_state(session=0x03, security_level=1, key_function=key)
+        ecu.requests.clear()
+
+        assert diag.ensure_state(session=0x03, security_level=1, key_function=key)
+        assert ecu.requests == [(0x10, 0x03), (0x27, 0x01), (0x27, 0x02)]
+
+
+class FakeItem:
+    """pytest item stand-in carrying markers from the outermost to the closest"""
+
+    def __init__(self, name, *marks):
+        self.name = name
+        self.marks = [mark.mark for mark in marks]
+
+    def iter_markers(self, name):
+        return (mark for mark in reversed(self.marks) if mark.name == name)
+
+    def get_closest_marker(self, name):
+        return next(self.iter_markers(name), None)
+
+
+class TestECUStateOrder:
+    """Test cases for grouping tests by required ECU state"""
+
+    def test_closer_markers_override(self):
+        """Test that method markers override module and class markers"""
+        item = FakeItem('test', pytest.mark.ecu_state(session=0x02, dtcs_cleared=True),
+                        pytest.mark.ecu_state(session=0x03, security_level=1),
+                        pytest.mark.ecu_state(security_level=3))
+        assert TestBase.required_ecu_state(item) == {'session': 0x03, 'security_level': 3,
+                                                     'dtcs_cleared': True}
+
+    def test_grouping(self):
+        """Test that tests are grouped by state with destructive tests last"""
+        items = [
+            FakeItem('lockout', pytest.mark.ecu_state(session=0x03), pytest.mark.ecu_state_destructive),
+            FakeItem('unlocked', pytest.mark.ecu_state(session=0x03, security_level=1)),
+            FakeItem('extended', pytest.mark.ecu_state(session=0x03)),
+            FakeItem('plain'),
+            FakeItem('unlocked_cleared', pytest.mark.ecu_state(session=0x03, security_level=1,
+                                                               dtcs_cleared=True)),
+            FakeItem('extended_2', pytest.mark.ecu_state(session=0x03)),
+        ]
+        items.sort(key=TestBase.ecu_state_order)
+        assert [item.name for item in items] == ['plain', 'extended', 'extended_2', 'unlocked',
+                                                 'unlocked_cleared', 'lockout']
+
+
+class TestKeyFunction:
+    """Test cases for the security access key function"""
+
+    def test_missing_key_function(self, monkeypatch):
+        """Test that unlocking without a configured key function fails clearly"""
+        monkeypatch.setattr(TestBase, 'key_function', None)
+        test = TestBase()
+        test.test_name = 'TestRoutineControl'
+        with pytest.raises(NotImplementedError, match="--key-function"):
+            test.calculate_key([0x12, 0x34])
+
+    def test_configured_key_function(self, monkeypatch):
+        """Test that the configured key function is used"""
+        monkeypatch.setattr(TestBase, 'key_function', key)
+        assert TestBase().calculate_key([0x12, 0x34]) == [0xED, 0xCB]
@@ -0,0 +1,97 @@
+import pytest
+from src.lib.results_store import ResultsStore
+
+DAY = 86400
+START = 1_700_000_000
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.db'), flush_interval=0.01)
+    yield store
+    store.close()
+
+
+class TestResultsStore:
+    """Test cases for the persisted results store"""
+
+    def test_record_and_query(self, store):
+        """Test that a result, its data and request timings read back"""
+        result_id = store.record('tests/test_x.py::TestX::test_a[0.3]', START, duration=1.5,
+                                 result='passed', ecu='BCM', firmware_version='1.2',
+                                 test_data={'dtc_snapshot': [0x19, 0x04]},
+                                 request_timings=[{'service_id': 0x22, 'sub_function': None,
+                                                   'timestamp': START, 'duration': 0.01,
+                                                   'success': True}])
+        assert store.flush(timeout=5)
+
+        results = store.query_results(ecu='BCM')
+        assert [r['id'] for r in results] == [result_id]
+        assert results[0]['test_name'] == 'tests/test_x.py::TestX::test_a[0.3]'
+        assert store.get_test_data(result_id) == {'dtc_snapshot': [0x19, 0x04]}
+        assert store.get_request_timings(result_id)[0]['duration'] == 0.01
+
+    def test_duration_trend_filters(self, store):
+        """Test that trends are grouped by day and filtered by ECU and firmware"""
+        for day in range(3):
+            for ecu, firmware_version in (('BCM', '1.0'), ('BCM', '2.0'), ('ECM', '1.0')):
+                store.record('test_a', START + day * DAY, duration=day + 1.0,
+                             result='passed' if day else 'failed',
+                             ecu=ecu, firmware_version=firmware_version)
+        assert store.flush(timeout=5)
+
+        trend = store.duration_trend('test_a', ecu='BCM', firmware_version='2.0')
+        assert [row['runs'] for row in trend] == [1, 1, 1]
+        assert [row['avg_duration'] for row in trend] == [1.0, 2.0, 3.0]
+        assert [row['passed'] for row in trend] == [0, 1, 1]
+        assert len(store.duration_trend('test_a', ecu='BCM', since=START + DAY)) == 2
+
+    @pytest.mark.parametrize('filters', [{}, {'ecu': 'BCM'}, {'firmware_version': '1.0'},
+                                         {'ecu': 'BCM', 'firmware_version': '1.0'}])
+    def test_trend_uses_covering_index(self, store, filters):
+        """Test that trend queries never scan beyond the test's index range"""
+        where, params = store._filters(filters.get('ecu'), filters.get('firmware_version'),
+                                       'test_a', START, None)
+        plan = store._query(f"EXPLAIN QUERY PLAN SELECT AVG(duration) FROM test_results{where}",
+                            params)
+        assert any('COVERING INDEX idx_results_test' in row['detail'] for row in plan), plan
+
+    def test_record_after_close(self, store):
+        """Test that recording into a closed store raises"""
+        store.close()
+        with pytest.raises(RuntimeError):
+            store.record('test_a', START)
+
+    def test_record_is_snapshot(self, store):
+        """Test that changes made after record() are not stored"""
+        test_data = {'voltage': [12.1]}
+        timings = [{'service_id': 0x22, 'timestamp': START, 'duration': 0.01, 'success': True}]
+        result_id = store.record('test_a', START, test_data=test_data, request_timings=timings)
+        test_data['voltage'].append(0.0)
+        timings[0]['duration'] = 9.9
+        assert store.flush(timeout=5)
+
+        assert store.get_test_data(result_id) == {'voltage': [12.1]}
+        assert store.get_request_timings(result_id)[0]['duration'] == 0.01
+
+    def test_bad_payload_fails_alone(self, store):
+        """Test that unencodable test data raises in record() and other results are kept"""
+        good = store.record('test_a', START)
+        circular = {}
+        circular['self'] = circular
+        with pytest.raises(ValueError):
+            store.record('test_b', START, test_data={'loop': circular})
+        other = store.record('test_c', START)
+        assert store.flush(timeout=5)
+
+        assert {r['id'] for r in store.query_results()} == {good, other}
+
+    @pytest.mark.parametrize('filters', [{}, {'since': START}, {'since': START, 'until': START + DAY}])
+    def test_time_window_uses_index(self, store, filters):
+        """Test that time window queries neither scan nor sort the whole table"""
+        where, params = store._filters(None, None, None, filters.get('since'), filters.get('until'))
+        plan = store._query(f"EXPLAIN QUERY PLAN SELECT * FROM test_results{where} "
+                            "ORDER BY start_time DESC LIMIT 10", params)
+        details = [row['detail'] for row in plan]
+        assert any('INDEX idx_results_start' in detail for detail in details), details
+        assert not any('TEMP B-TREE' in detail for detail in details), details
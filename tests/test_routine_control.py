@@ -4,6 +4,7 @@ from src.lib.can_interface import CANInterface
 from src.lib.diagnostic_interface import DiagnosticInterface
 import time
 
+@pytest.mark.ecu_state(session=0x03, security_level=1)
 class TestRoutineControl(TestBase):
     """Test cases for Routine Control"""
     
@@ -65,6 +66,7 @@ class TestRoutineControl(TestBase):
         data = [(routine_id >> 8) & 0xFF, routine_id & 0xFF]
         return self.diag_interface.send_diagnostic_request(0x31, 0x03, data)
     
+    @pytest.mark.ecu_state(dtcs_cleared=True)
     def test_self_test_routine(self):
         """Test ECU self-test routine"""
         SELF_TEST_ROUTINE_ID = 0xFF00